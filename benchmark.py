@@ -0,0 +1,415 @@
+#!/bin/env python3
+
+import array
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import traceback
+from time import perf_counter
+
+import click
+import serial
+
+from src.BinaryCaptureWriter import BinaryCaptureWriter
+from src.CompressedCsvWriter import CompressedCsvWriter
+from src.CsvWriter import CsvWriter
+from src.DataAnalysis import DataAnalysis
+from src.LPM01A import LPM01A
+
+CAPTURE_FORMATS = {
+    "csv": CsvWriter,
+    "csv.gz": CompressedCsvWriter,
+    "lpmc": BinaryCaptureWriter,
+}
+
+# ru_maxrss is reported in bytes on macOS and in KiB on Linux
+RU_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class EndOfStream(Exception):
+    """Raised by EmulatedSerial when the emulated capture is over."""
+
+
+class EmulatedSerial:
+    """Stands in for serial.Serial, acknowledges the commands and streams a synthetic ASCII capture."""
+
+    CHUNK_SIZE = 4096
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.is_open = True
+        self.capture = None
+        self._responses = b""
+        self._pending = b""
+
+    def write(self, data: bytes) -> None:
+        command = data.decode().strip()
+        if command == "stop":
+            self._responses += b"PowerShield > Acquisition completed\n"
+        else:
+            self._responses += f"PowerShield > ack {command}\n".encode()
+
+    def readline(self) -> bytes:
+        line, _, self._responses = self._responses.partition(b"\n")
+        return line + b"\n"
+
+    @property
+    def in_waiting(self) -> int:
+        return self.CHUNK_SIZE
+
+    def read(self, num_bytes: int) -> bytes:
+        while len(self._pending) < num_bytes:
+            chunk = next(self.capture, None)
+            if chunk is None:
+                if self._pending:
+                    break
+                raise EndOfStream
+            self._pending += chunk
+        data, self._pending = self._pending[:num_bytes], self._pending[num_bytes:]
+        return data
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+def generate_samples(num_rows: int, freq: int = 5000, seed: int = 0):
+    """Yields reproducible synthetic samples (mantissa, exponent, rx timestamp us, board timestamp ms)."""
+    rng = random.Random(seed)
+    period_us = 1_000_000 // freq
+    rx_timestamp_us = 0
+    for i in range(num_rows):
+        rx_timestamp_us += period_us + rng.randint(-period_us // 10, period_us // 10)
+        # Mostly sleep currents (uA) with occasional active bursts (mA)
+        exponent = -6 if rng.random() < 0.9 else -3
+        yield rng.randint(1000, 9999), exponent, rx_timestamp_us, (i * 1000) // freq
+
+
+def generate_ascii_stream(num_rows: int, freq: int = 5000, seed: int = 0):
+    """Yields the ASCII output of the LPM01A for num_rows synthetic samples in chunks."""
+    lines = []
+    for i, (mantissa, exponent, _, board_timestamp_ms) in enumerate(
+        generate_samples(num_rows, freq, seed)
+    ):
+        if i % freq == 0:
+            lines.append(
+                f"TimeStamp: {board_timestamp_ms // 1000}s {board_timestamp_ms % 1000}ms, buff 0%\n\x00"
+            )
+        lines.append(f"{mantissa:04d}-{-exponent:02d}\n")
+        if len(lines) >= 1000:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
+
+
+def measure_peak_rss(func) -> int:
+    """Runs func in a forked process and returns how much its peak RSS grew in bytes.
+
+    Unlike tracemalloc, the RSS includes the allocations done by C extensions
+    (e.g. the pandas CSV parser and numpy).
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(write_fd, str((peak_rss - start_rss) * RU_MAXRSS_UNIT).encode())
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+    if not result:
+        raise RuntimeError("The memory measurement process failed")
+    return int(result)
+
+
+def measure(func, repeat: int, measure_memory: bool) -> tuple[float, int]:
+    """Runs func repeat times and returns the best time in s and the peak RSS increase in bytes.
+
+    The output of func is discarded. Memory is measured in a separate run in a forked
+    process, so the peak RSS of the previous benchmarks doesn't hide it.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            tick_start = perf_counter()
+            func()
+            seconds = min(seconds, perf_counter() - tick_start)
+
+    peak_rss_bytes = measure_peak_rss(func) if measure_memory else None
+
+    return seconds, peak_rss_bytes
+
+
+def make_sample_columns(num_rows: int) -> tuple[array.array, ...]:
+    """Generates the synthetic samples once and stores them as compact columns.
+
+    Returns:
+        tuple[array.array, ...]: The mantissa, exponent, rx timestamp us and board timestamp ms columns.
+    """
+    columns = tuple(array.array("q") for _ in range(4))
+    for sample in generate_samples(num_rows):
+        for column, value in zip(columns, sample):
+            column.append(value)
+    return columns
+
+
+def benchmark_parse(capture_format: str, ascii_chunks: list[bytes], num_rows: int) -> None:
+    """Runs the acquisition path (ASCII parsing and writing) on an emulated serial stream.
+
+    The emulated serial replays the pre-generated ascii_chunks holding num_rows samples.
+    """
+    original_serial = serial.Serial
+    serial.Serial = EmulatedSerial
+    try:
+        lpm = LPM01A(
+            "emulated", 0, print_info_every_ms=2**32, capture_format=capture_format
+        )
+    finally:
+        serial.Serial = original_serial
+
+    lpm.init_device(mode="ascii", voltage=3300, freq=5000, duration=0)
+    lpm.serial_comm.ser.capture = iter(ascii_chunks)
+    lpm.start_capture()
+    try:
+        lpm.read_and_parse_data()
+    except EndOfStream:
+        pass
+    lpm.deinit_capture()
+
+    if lpm.num_of_captured_values != num_rows:
+        raise RuntimeError(
+            f"Parsed {lpm.num_of_captured_values} values instead of {num_rows}"
+        )
+
+
+def write_capture(
+    capture_format: str, sample_columns: tuple[array.array, ...], filename: str
+) -> None:
+    """Writes a capture with the pre-generated samples returned by make_sample_columns."""
+    writer = CAPTURE_FORMATS[capture_format](filename)
+    writer.write_header()
+    for sample in zip(*sample_columns):
+        writer.write_sample(*sample)
+    writer.close()
+
+
+def get_revision() -> str:
+    """Returns the current git revision, with a -dirty suffix for uncommitted changes."""
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = "unknown"
+    return revision
+
+
+def load_previous_results(history_path: str) -> dict:
+    """Returns the results of the last run in the history, keyed by (benchmark, format, rows)."""
+    if not os.path.exists(history_path):
+        return {}
+
+    last_run = None
+    with open(history_path, "r") as file:
+        for line in file:
+            if line.strip():
+                last_run = json.loads(line)
+    if last_run is None:
+        return {}
+
+    return {
+        (result["benchmark"], result["format"], result["rows"]): result
+        for result in last_run["results"]
+    }
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--rows",
+    multiple=True,
+    type=int,
+    default=[1_000, 10_000, 100_000, 1_000_000],
+    show_default=True,
+    help="Number of synthetic rows, can be used multiple times (e.g. -r 1000 -r 10000000).",
+)
+@click.option(
+    "-f",
+    "--formats",
+    multiple=True,
+    type=click.Choice(list(CAPTURE_FORMATS)),
+    default=list(CAPTURE_FORMATS),
+    show_default=True,
+    help="Capture formats to benchmark, can be used multiple times.",
+)
+@click.option(
+    "-n",
+    "--repeat",
+    default=3,
+    show_default=True,
+    help="Runs per benchmark, the best time is kept.",
+)
+@click.option(
+    "--max-parse-rows",
+    default=1_000_000,
+    show_default=True,
+    help="Skip the acquisition parsing benchmark for more rows than this.",
+)
+@click.option(
+    "--max-integration-rows",
+    default=100_000,
+    show_default=True,
+    help="Skip the calculate_average_current benchmark for more rows than this.",
+)
+@click.option("--no-memory", is_flag=True, help="Don't measure the peak RSS.")
+@click.option(
+    "--history",
+    default="benchmark_history.jsonl",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="File the results are appended to (one JSON object per run).",
+)
+@click.help_option("-h", "--help")
+def main(
+    rows: tuple,
+    formats: tuple,
+    repeat: int,
+    max_parse_rows: int,
+    max_integration_rows: int,
+    no_memory: bool,
+    history: str,
+):
+    """Benchmarks the acquisition parsing, the capture writers and the data analysis on synthetic captures.
+
+    The results are appended to the history file and compared with the previous run.
+    The synthetic data is generated once per number of rows, outside of the timed runs.
+
+    Example usage:
+
+    python benchmark.py -r 1000 -r 1000000 -f lpmc
+    """
+    history_path = os.path.abspath(history)
+    previous_results = load_previous_results(history_path)
+    results = []
+
+    def report(benchmark: str, capture_format: str, num_rows: int, func) -> None:
+        seconds, peak_rss_bytes = measure(func, repeat, not no_memory)
+        result = {
+            "benchmark": benchmark,
+            "format": capture_format,
+            "rows": num_rows,
+            "seconds": seconds,
+            "rows_per_s": num_rows / seconds,
+            "peak_rss_bytes": peak_rss_bytes,
+        }
+        results.append(result)
+
+        line = f"{benchmark:<22} {capture_format:<7} {num_rows:>11} rows {seconds:>10.4f} s {result['rows_per_s']:>14.0f} rows/s"
+        if peak_rss_bytes is not None:
+            line += f" {peak_rss_bytes / 1_000_000:>10.1f} MB"
+        previous = previous_results.get((benchmark, capture_format, num_rows))
+        if previous:
+            line += f" ({(seconds / previous['seconds'] - 1) * 100:+.1f}% time)"
+        print(line)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The writers create their files relative to the working directory
+        working_dir = os.getcwd()
+        os.chdir(temp_dir)
+        try:
+            for num_rows in sorted(rows):
+                sample_columns = make_sample_columns(num_rows)
+                ascii_chunks = (
+                    list(generate_ascii_stream(num_rows))
+                    if num_rows <= max_parse_rows
+                    else None
+                )
+
+                for capture_format in formats:
+                    filename = f"bench_{num_rows}{CAPTURE_FORMATS[capture_format].FILE_EXTENSION}"
+                    file_path = f"{CsvWriter.CSV_LOGS_FOLDER}/{filename}"
+
+                    if num_rows <= max_parse_rows:
+                        report(
+                            "parse_ascii",
+                            capture_format,
+                            num_rows,
+                            lambda: benchmark_parse(
+                                capture_format, ascii_chunks, num_rows
+                            ),
+                        )
+
+                    report(
+                        "write_sample",
+                        capture_format,
+                        num_rows,
+                        lambda: write_capture(
+                            capture_format, sample_columns, filename
+                        ),
+                    )
+                    results[-1]["bytes_per_row"] = os.path.getsize(file_path) / num_rows
+
+                    report(
+                        "load",
+                        capture_format,
+                        num_rows,
+                        lambda: DataAnalysis(file_path, try_cache=False),
+                    )
+
+                    # The integration doesn't depend on the file format, run it once
+                    if num_rows <= max_integration_rows and capture_format == formats[0]:
+                        da = DataAnalysis(file_path, try_cache=False)
+                        report(
+                            "calculate_avg_current",
+                            capture_format,
+                            num_rows,
+                            da.calculate_average_current,
+                        )
+
+                    os.remove(file_path)
+        finally:
+            os.chdir(working_dir)
+
+    with open(history_path, "a") as file:
+        file.write(
+            json.dumps(
+                {
+                    "date": dt.datetime.now().isoformat(timespec="seconds"),
+                    "revision": get_revision(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                }
+            )
+            + "\n"
+        )
+    print(f"Results appended to {history_path}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("KeyboardInterrupt detected. Exiting...")
+        exit(0)
@@ -2,13 +2,15 @@
 
 from src.LPM01A import LPM01A
 
+lpm = LPM01A(port="/dev/ttyACM0", baud_rate=3864000, print_info_every_ms=10_000)
 try:
-    lpm = LPM01A(port="/dev/ttyACM0", baud_rate=3864000, print_info_every_ms=10_000)
     lpm.init_device(mode="ascii", voltage=3300, freq=1000, duration=0)
     lpm.start_capture()
     lpm.read_and_parse_data()
 except KeyboardInterrupt:
     print("KeyboardInterrupt detected. Exiting...")
     lpm.stop_capture()
-    lpm.deinit_capture()
     exit(0)
+finally:
+    # Flushes the buffered capture data and completes the manifest, also after an error
+    lpm.deinit_capture()
@@ -0,0 +1,128 @@
+import struct
+from src.CsvWriter import CsvWriter
+
+
+class BinaryCaptureWriter(CsvWriter):
+    """Writes the capture in a compact delta/varint encoded binary format (.lpmc).
+
+    File layout:
+        - header: magic b"LPMC" followed by the format version (1 byte)
+        - records, one per sample, each made of 4 LEB128 varints:
+            1. zigzag encoded delta of the rx timestamp in us
+            2. zigzag encoded delta of the board timestamp in ms
+            3. mantissa of the current in A (as sent by the LPM01A)
+            4. zigzag encoded base 10 exponent of the current in A
+
+    A gap in the capture (e.g. a serial reconnect) is stored as a record with the
+    exponent set to GAP_EXPONENT, which is decoded as a missing current value.
+
+    The rx timestamp delta is close to the sampling period and the board timestamp
+    delta is mostly 0, so a typical record takes 5-7 bytes instead of ~30 in CSV.
+    The records are decoded in vectorized form by DataAnalysis.
+    """
+
+    FILE_EXTENSION = ".lpmc"
+    MAGIC = b"LPMC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sB")
+    FIELDS_PER_RECORD = 4
+    GAP_EXPONENT = 127
+    # A 64 bit value takes at most 10 bytes as a varint
+    MAX_VARINT_LENGTH = 10
+
+    FLUSH_SIZE = 64 * 1024
+
+    def __init__(self, filename: str = None) -> None:
+        """Initializes the BinaryCaptureWriter with the given filename.
+
+        Args:
+            filename (str): The filename for the capture file. If None, a filename will be generated based on the current date and time.
+        """
+        super().__init__(filename)
+
+        self._buffer = bytearray()
+        self._last_rx_timestamp_us = 0
+        self._last_board_timestamp_ms = 0
+
+    def _open_file(self, path: str):
+        """Opens the file at the given path for binary writing."""
+        return open(path, "wb")
+
+    @staticmethod
+    def _zigzag(value: int) -> int:
+        """Maps a signed integer to an unsigned one (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...)."""
+        return value << 1 if value >= 0 else (-value << 1) - 1
+
+    def _append_varint(self, value: int) -> None:
+        """Appends an unsigned integer to the buffer as a LEB128 varint."""
+        while value >= 0x80:
+            self._buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self._buffer.append(value)
+
+    def _flush_buffer(self) -> None:
+        """Writes the buffered records to the file."""
+        self.file.write(self._buffer)
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> None:
+        """Writes the given raw bytes to the file."""
+        self._buffer += data
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            self._flush_buffer()
+
+    def get_size(self) -> int:
+        """Returns the number of bytes written so far, including the buffered records."""
+        return self.file.tell() + len(self._buffer)
+
+    def write_header(self) -> None:
+        """Writes the file header (magic and format version) straight to the file."""
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION))
+        self.file.flush()
+
+    def write_sample(
+        self,
+        mantissa: int,
+        exponent: int,
+        rx_timestamp_us: int,
+        board_timestamp_ms: int,
+    ) -> None:
+        """Encodes a single sample as a record.
+
+        Args:
+            mantissa (int): The mantissa of the current in A as sent by the LPM01A.
+            exponent (int): The base 10 exponent of the current in A.
+            rx_timestamp_us (int): The local receive timestamp in us.
+            board_timestamp_ms (int): The last timestamp reported by the LPM01A in ms.
+        """
+        if mantissa < 0:
+            raise ValueError(f"Mantissa must not be negative: {mantissa}")
+
+        self._append_varint(
+            self._zigzag(rx_timestamp_us - self._last_rx_timestamp_us)
+        )
+        self._append_varint(
+            self._zigzag(board_timestamp_ms - self._last_board_timestamp_ms)
+        )
+        self._append_varint(mantissa)
+        self._append_varint(self._zigzag(exponent))
+
+        self._last_rx_timestamp_us = rx_timestamp_us
+        self._last_board_timestamp_ms = board_timestamp_ms
+
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            self._flush_buffer()
+
+    def write_gap(self, rx_timestamp_us: int, board_timestamp_ms: int) -> None:
+        """Writes a gap marker record.
+
+        Args:
+            rx_timestamp_us (int): The local receive timestamp in us when the capture resumed.
+            board_timestamp_ms (int): The board timestamp in ms when the capture resumed.
+        """
+        self.write_sample(0, self.GAP_EXPONENT, rx_timestamp_us, board_timestamp_ms)
+
+    def close(self) -> None:
+        """Writes the buffered records and closes the file."""
+        self._flush_buffer()
+        super().close()
@@ -0,0 +1,309 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+from src.CsvWriter import CsvWriter
+
+
+class CompressedCsvWriter(CsvWriter):
+    """CSV writer that compresses the data on the fly into independent gzip blocks.
+
+    Every block is a complete gzip member holding whole CSV lines, so the file can be
+    read by any gzip aware tool (zcat, pandas, ...). Each member also carries its own
+    size in the "LP" extra subfield, which lets CompressedCsvReader jump from block to
+    block without inflating the whole file.
+
+    Compression runs on a background thread so write() only appends to a buffer.
+    If the thread fails (e.g. the disk is full), the error is raised by the next
+    write() or by close().
+    """
+
+    FILE_EXTENSION = ".csv.gz"
+    BLOCK_SIZE = 64 * 1024
+    # Blocks waiting for the compression thread before write() blocks
+    MAX_QUEUED_BLOCKS = 64
+
+    # gzip member header with FEXTRA flag set, followed by the "LP" subfield
+    # holding the total size of the member in bytes
+    GZIP_HEADER = struct.Struct("<BBBBIBBH")
+    LP_SUBFIELD = struct.Struct("<ccHI")
+    GZIP_TRAILER = struct.Struct("<II")
+
+    def __init__(
+        self,
+        filename: str = None,
+        block_size: int = BLOCK_SIZE,
+        compression_level: int = 6,
+    ) -> None:
+        """Initializes the CompressedCsvWriter with the given filename.
+
+        Args:
+            filename (str): The filename for the compressed CSV file. If None, a filename will be generated based on the current date and time.
+            block_size (int): The amount of uncompressed data in bytes after which a block is compressed.
+            compression_level (int): The zlib compression level (1 fastest - 9 smallest).
+        """
+        super().__init__(filename)
+
+        self.block_size = block_size
+        self.compression_level = compression_level
+
+        self._buffer = []
+        self._buffer_len = 0
+        self._compressed_size = 0
+        self._worker_error = None
+
+        self._blocks = queue.Queue(maxsize=self.MAX_QUEUED_BLOCKS)
+        self._worker = threading.Thread(target=self._compress_blocks, daemon=True)
+        self._worker.start()
+
+    def _open_file(self, path: str):
+        """Opens the file at the given path for binary writing."""
+        return open(path, "wb")
+
+    def _compress_blocks(self) -> None:
+        """Compresses the queued blocks and writes them to the file until None is received.
+
+        On error the exception is stored and the remaining blocks are discarded, so
+        write() and close() never block on a dead thread.
+        """
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                return
+            if self._worker_error is not None:
+                continue
+            try:
+                member = self._make_gzip_member(block)
+                self.file.write(member)
+                self._compressed_size += len(member)
+            except Exception as e:
+                self._worker_error = e
+
+    def _raise_worker_error(self) -> None:
+        """Raises the error of the compression thread, if any."""
+        if self._worker_error is not None:
+            raise OSError(
+                f"Writing {self.filename} failed: {self._worker_error}"
+            ) from self._worker_error
+
+    def _make_gzip_member(self, data: bytes) -> bytes:
+        """Compresses the given data into a single gzip member.
+
+        Args:
+            data (bytes): The uncompressed data.
+
+        Returns:
+            bytes: The gzip member.
+        """
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+
+        member_size = (
+            self.GZIP_HEADER.size
+            + self.LP_SUBFIELD.size
+            + len(deflated)
+            + self.GZIP_TRAILER.size
+        )
+
+        # ID1, ID2, CM (deflate), FLG (FEXTRA), MTIME, XFL, OS (unknown), XLEN
+        header = self.GZIP_HEADER.pack(
+            0x1F, 0x8B, 8, 4, 0, 0, 255, self.LP_SUBFIELD.size
+        )
+        subfield = self.LP_SUBFIELD.pack(b"L", b"P", 4, member_size)
+        trailer = self.GZIP_TRAILER.pack(zlib.crc32(data), len(data) & 0xFFFFFFFF)
+
+        return header + subfield + deflated + trailer
+
+    def _flush_block(self, final: bool = False) -> None:
+        """Hands the buffered lines over to the compression thread.
+
+        Args:
+            final (bool): If True the whole buffer is flushed, otherwise a trailing partial line is kept in the buffer.
+        """
+        data = "".join(self._buffer)
+        self._buffer = []
+        self._buffer_len = 0
+
+        if not final:
+            # Keep blocks aligned to line boundaries so every block can be parsed on its own
+            split_index = data.rfind("\n") + 1
+            if split_index < len(data):
+                self._buffer.append(data[split_index:])
+                self._buffer_len = len(data) - split_index
+            data = data[:split_index]
+
+        if data:
+            self._blocks.put(data.encode())
+
+    def get_size(self) -> int:
+        """Returns the number of compressed bytes written to the file so far."""
+        return self._compressed_size
+
+    def write(self, data: str) -> None:
+        """Writes the given data to the file.
+
+        Raises:
+            OSError: If the compression thread failed to write a previous block.
+        """
+        self._raise_worker_error()
+        self._buffer.append(data)
+        self._buffer_len += len(data)
+        if self._buffer_len >= self.block_size:
+            self._flush_block()
+
+    def close(self) -> None:
+        """Compresses the remaining data and closes the file.
+
+        Raises:
+            OSError: If the compression thread failed to write a block.
+        """
+        self._flush_block(final=True)
+        self._blocks.put(None)
+        self._worker.join()
+        super().close()
+        self._raise_worker_error()
+
+
+class CompressedCsvReader:
+    """Random access reader for files written by CompressedCsvWriter."""
+
+    def __init__(self, file_path: str) -> None:
+        """Initializes the CompressedCsvReader and indexes the blocks of the given file.
+
+        Args:
+            file_path (str): The path of the compressed CSV file.
+        """
+        self.file_path = file_path
+        self.block_offsets = []
+        self.block_sizes = []
+        self.header = None
+
+        self._index_blocks()
+
+        self.header = self.read_block(0).split("\n", 1)[0] if self.block_offsets else ""
+
+    def _index_blocks(self) -> None:
+        """Walks through the gzip member headers and stores the offset and size of each block.
+
+        A last block which isn't completely written (e.g. after a power loss) is dropped.
+        """
+        header_size = CompressedCsvWriter.GZIP_HEADER.size
+        subfield_size = CompressedCsvWriter.LP_SUBFIELD.size
+
+        with open(self.file_path, "rb") as file:
+            file_size = os.fstat(file.fileno()).st_size
+            offset = 0
+            while True:
+                file.seek(offset)
+                header = file.read(header_size + subfield_size)
+                if len(header) < header_size + subfield_size:
+                    return
+
+                id1, id2, _, flags, _, _, _, xlen = CompressedCsvWriter.GZIP_HEADER.unpack(
+                    header[:header_size]
+                )
+                si1, si2, _, member_size = CompressedCsvWriter.LP_SUBFIELD.unpack(
+                    header[header_size:]
+                )
+                if (id1, id2, si1, si2) != (0x1F, 0x8B, b"L", b"P") or not flags & 4:
+                    raise ValueError(
+                        f"{self.file_path} is not a block compressed CSV file (offset {offset})"
+                    )
+                if offset + member_size > file_size:
+                    return
+
+                self.block_offsets.append(offset)
+                self.block_sizes.append(member_size)
+                offset += member_size
+
+    def get_number_of_blocks(self) -> int:
+        """Returns the number of blocks in the file.
+
+        Returns:
+            int: The number of blocks.
+        """
+        return len(self.block_offsets)
+
+    def read_block(self, block_index: int) -> str:
+        """Decompresses a single block.
+
+        Args:
+            block_index (int): The index of the block.
+
+        Returns:
+            str: The CSV lines stored in the block.
+        """
+        data_start = (
+            CompressedCsvWriter.GZIP_HEADER.size + CompressedCsvWriter.LP_SUBFIELD.size
+        )
+        with open(self.file_path, "rb") as file:
+            file.seek(self.block_offsets[block_index])
+            member = file.read(self.block_sizes[block_index])
+
+        deflated = member[data_start : -CompressedCsvWriter.GZIP_TRAILER.size]
+        return zlib.decompress(deflated, -15).decode()
+
+    def _first_value_in_block(self, block_index: int, column_index: int) -> float:
+        """Returns the value of the given column in the first data line of a block."""
+        for line in self.read_block(block_index).split("\n"):
+            if not line or line.startswith("#") or line == self.header:
+                continue
+            try:
+                return float(line.split(",")[column_index])
+            except ValueError:
+                continue
+        return float("inf")
+
+    def find_blocks(
+        self, column: str, start_value: float, end_value: float
+    ) -> tuple[int, int]:
+        """Finds the blocks that hold the lines with the column value between start_value and end_value.
+
+        The column must be sorted in ascending order (e.g. a timestamp).
+
+        Args:
+            column (str): The name of the column.
+            start_value (float): The start value.
+            end_value (float): The end value.
+
+        Returns:
+            tuple[int, int]: The first and the last block index (inclusive).
+        """
+        column_index = self.header.split(",").index(column)
+
+        # Last block whose first value is not greater than value (bisect right - 1)
+        def last_block_starting_before(value: float) -> int:
+            low, high = 0, self.get_number_of_blocks()
+            while low < high:
+                middle = (low + high) // 2
+                if self._first_value_in_block(middle, column_index) <= value:
+                    low = middle + 1
+                else:
+                    high = middle
+            return max(low - 1, 0)
+
+        return (
+            last_block_starting_before(start_value),
+            last_block_starting_before(end_value),
+        )
+
+    def read_blocks(self, first_block: int, last_block: int) -> str:
+        """Decompresses the blocks between first_block and last_block (inclusive).
+
+        The CSV header is prepended if the first block doesn't contain it.
+
+        Args:
+            first_block (int): The index of the first block.
+            last_block (int): The index of the last block.
+
+        Returns:
+            str: The CSV lines stored in the blocks.
+        """
+        data = "".join(
+            self.read_block(block_index)
+            for block_index in range(first_block, last_block + 1)
+        )
+        if first_block != 0:
+            data = f"{self.header}\n{data}"
+        return data
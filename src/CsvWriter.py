@@ -1,9 +1,12 @@
 import datetime
 import os
+from src.UnitConversions import UnitConversions
 
 
 class CsvWriter:
     CSV_LOGS_FOLDER = "lpm01a_csv_files"
+    FILE_EXTENSION = ".csv"
+    CSV_HEADER = "Current (uA),rx timestamp (us),board timestamps (ms)\n"
 
     def __init__(self, filename: str = None) -> None:
         """Initializes the CsvWriter with the given filename.
@@ -18,13 +21,19 @@ class CsvWriter:
 
         print("Creating file: ", filename)
 
+        self.uc = UnitConversions()
+
         self.filename = filename
-        self.file = open(f"{self.CSV_LOGS_FOLDER}/{filename}", "w")
+        self.file = self._open_file(f"{self.CSV_LOGS_FOLDER}/{filename}")
+
+    def _open_file(self, path: str):
+        """Opens the file at the given path for writing."""
+        return open(path, "w")
 
     def _make_filename(self) -> str:
         """Creates a filename based on the current time."""
         now = datetime.datetime.now()
-        return f"lpm01a_{now.strftime('%H%M%S_%d%m%Y')}.csv"
+        return f"lpm01a_{now.strftime('%H%M%S_%d%m%Y')}{self.FILE_EXTENSION}"
 
     def _make_folder(self) -> None:
         """Creates the folder for the CSV files if it doesn't exist."""
@@ -36,6 +45,43 @@ class CsvWriter:
         """Writes the given data to the file."""
         self.file.write(data)
 
+    def get_size(self) -> int:
+        """Returns the number of bytes written to the file so far."""
+        return self.file.tell()
+
+    def write_header(self) -> None:
+        """Writes the CSV header to the file."""
+        self.write(self.CSV_HEADER)
+
+    def write_sample(
+        self,
+        mantissa: int,
+        exponent: int,
+        rx_timestamp_us: int,
+        board_timestamp_ms: int,
+    ) -> None:
+        """Writes a single sample as a CSV line.
+
+        Args:
+            mantissa (int): The mantissa of the current in A as sent by the LPM01A.
+            exponent (int): The base 10 exponent of the current in A.
+            rx_timestamp_us (int): The local receive timestamp in us.
+            board_timestamp_ms (int): The last timestamp reported by the LPM01A in ms.
+        """
+        current = self.uc.mantissa_exponent_to_uA(mantissa, exponent)
+        self.write(f"{current},{rx_timestamp_us},{board_timestamp_ms}\n")
+
+    def write_gap(self, rx_timestamp_us: int, board_timestamp_ms: int) -> None:
+        """Writes a gap marker, a line without current.
+
+        The interval between the previous line and the gap marker holds no valid data.
+
+        Args:
+            rx_timestamp_us (int): The local receive timestamp in us when the capture resumed.
+            board_timestamp_ms (int): The board timestamp in ms when the capture resumed.
+        """
+        self.write(f",{rx_timestamp_us},{board_timestamp_ms}\n")
+
     def close(self) -> None:
         """Closes the file."""
         print("Closing file: ", self.filename)
@@ -1,8 +1,16 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from time import time
+import io
+import json
+import os
 import re
 import shutil
+from src.BinaryCaptureWriter import BinaryCaptureWriter
+from src.CompressedCsvWriter import CompressedCsvReader, CompressedCsvWriter
+from src.CsvWriter import CsvWriter
+from src.SegmentedCaptureWriter import SegmentedCaptureWriter
 from src.UnitConversions import UnitConversions
 
 
@@ -36,6 +44,10 @@ class DataAnalysis:
 
     TEMP_FILE_PATH = "/tmp/temp.csv"
 
+    # Size of the chunks in which binary captures are decoded. A chunk holds up to
+    # ~1 varint per byte and every varint needs ~40 bytes of temporary arrays.
+    DECODE_CHUNK_SIZE = 1024 * 1024
+
     def __init__(
         self,
         csv_file_path: str,
@@ -46,7 +58,8 @@ class DataAnalysis:
         """Initializes the DataAnalysis with the given csv_file_path and timestamps.
 
         Args:
-            csv_file_path (str): The path of the CSV file.
+            csv_file_path (str): The path of the CSV file. Files ending with .csv.gz are read as block compressed CSV files
+                and files ending with .lpmc as binary captures. A segment manifest (.manifest.json) is read as one capture.
             start_timestamp_us (int, optional): The start timestamp in us for filtering data. Defaults to 0.
             end_timestamp_us (int, optional): The end timestamp in us for filtering data. Defaults to 2^32.
             try_cache (bool, optional): Try to load the cached data from the CSV file. Defaults to True.
@@ -57,16 +70,327 @@ class DataAnalysis:
         self.uc = UnitConversions()
 
         self.cached_data = None
-        if try_cache:
+        if try_cache and self._is_plain_csv():
             self.cached_data = self._load_csv_cache(self.csv_file_path)
 
-        self.df = pd.read_csv(self.csv_file_path, comment="#")
+        if self.csv_file_path.endswith(SegmentedCaptureWriter.MANIFEST_EXTENSION):
+            self.df = self._read_manifest(
+                self.csv_file_path, start_timestamp_us, end_timestamp_us, try_cache
+            )
+        else:
+            self.df = self._read_capture(
+                self.csv_file_path, start_timestamp_us, end_timestamp_us
+            )
 
         self.filtered_df = self.df[
             (self.df["rx timestamp (us)"] >= start_timestamp_us)
             & (self.df["rx timestamp (us)"] <= end_timestamp_us)
         ]
 
+    def _is_plain_csv(self) -> bool:
+        """Returns True if the analysed file is an uncompressed CSV file which can hold the cache comment."""
+        return not self.csv_file_path.endswith(
+            (
+                CompressedCsvWriter.FILE_EXTENSION,
+                BinaryCaptureWriter.FILE_EXTENSION,
+                SegmentedCaptureWriter.MANIFEST_EXTENSION,
+            )
+        )
+
+    def _make_empty_capture(self) -> pd.DataFrame:
+        """Returns a data frame with the capture columns and no rows."""
+        current_column, rx_timestamp_column, board_timestamp_column = (
+            CsvWriter.CSV_HEADER.strip().split(",")
+        )
+        return pd.DataFrame(
+            {
+                current_column: np.array([], dtype=np.float64),
+                rx_timestamp_column: np.array([], dtype=np.int64),
+                board_timestamp_column: np.array([], dtype=np.int64),
+            }
+        )
+
+    def _read_capture(
+        self,
+        capture_file_path: str,
+        start_timestamp_us: int,
+        end_timestamp_us: int,
+        allow_empty: bool = False,
+    ) -> pd.DataFrame:
+        """Reads a single capture file in any of the supported formats.
+
+        Args:
+            capture_file_path (str): The path of the capture file.
+            start_timestamp_us (int): The start timestamp in us, used to skip blocks of compressed files.
+            end_timestamp_us (int): The end timestamp in us, used to skip blocks of compressed files.
+            allow_empty (bool, optional): Return no rows instead of raising if the file contains no data yet
+                (e.g. a segment which is still being written). Defaults to False.
+
+        Returns:
+            pd.DataFrame: The data from the capture file.
+        """
+        if allow_empty and os.path.getsize(capture_file_path) == 0:
+            return self._make_empty_capture()
+        if capture_file_path.endswith(CompressedCsvWriter.FILE_EXTENSION):
+            return self._read_compressed_csv(
+                capture_file_path, start_timestamp_us, end_timestamp_us, allow_empty
+            )
+        if capture_file_path.endswith(BinaryCaptureWriter.FILE_EXTENSION):
+            return self._read_binary_capture(capture_file_path, allow_empty)
+        return pd.read_csv(capture_file_path, comment="#")
+
+    def _read_manifest(
+        self,
+        manifest_path: str,
+        start_timestamp_us: int,
+        end_timestamp_us: int,
+        try_cache: bool,
+    ) -> pd.DataFrame:
+        """Reads the segments listed in a manifest that overlap the given timestamps.
+
+        If the whole capture is used and all segments are complete, the segment
+        summaries are also loaded as cached data.
+
+        Args:
+            manifest_path (str): The path of the manifest written by SegmentedCaptureWriter.
+            start_timestamp_us (int): The start timestamp in us.
+            end_timestamp_us (int): The end timestamp in us.
+            try_cache (bool): Load the segment summaries as cached data.
+
+        Returns:
+            pd.DataFrame: The data from the overlapping segments.
+        """
+        with open(manifest_path, "r") as file:
+            manifest = json.load(file)
+
+        segments_folder = os.path.dirname(manifest_path)
+
+        # Segments which are still being written or were not closed properly (e.g. power
+        # loss) have no reliable time range. They start after the end of the previous
+        # segment, so they are read for every window ending after it.
+        segments = []
+        previous_end_us = 0
+        for segment in manifest["segments"]:
+            if segment["complete"]:
+                if (
+                    segment["num_values"] > 0
+                    and segment["end_us"] >= start_timestamp_us
+                    and segment["start_us"] <= end_timestamp_us
+                ):
+                    segments.append(segment)
+            elif previous_end_us <= end_timestamp_us:
+                segments.append(segment)
+
+            if segment["end_us"] is not None:
+                previous_end_us = segment["end_us"]
+        if not segments:
+            raise ValueError(
+                f"No segment in '{manifest_path}' overlaps the selected time window."
+            )
+
+        if try_cache and len(segments) == len(manifest["segments"]) and all(
+            segment["complete"] for segment in segments
+        ):
+            self.cached_data = self._make_manifest_cache(manifest)
+
+        return pd.concat(
+            [
+                self._read_capture(
+                    os.path.join(segments_folder, segment["file"]),
+                    start_timestamp_us,
+                    end_timestamp_us,
+                    allow_empty=not segment["complete"],
+                )
+                for segment in segments
+            ],
+            ignore_index=True,
+        )
+
+    def _make_manifest_cache(self, manifest: dict) -> CacheData:
+        """Creates the cached data for the whole capture from the segment summaries of a manifest."""
+        segments = [
+            segment for segment in manifest["segments"] if segment["num_values"] > 0
+        ]
+        if not segments:
+            return None
+
+        cd = CacheData()
+        cd.date, cd.time = manifest["created"].split("_")
+        cd.time_window_s = self.uc.us_to_s(
+            segments[-1]["end_us"]
+            - segments[0]["start_us"]
+            - sum(segment["gap_us"] for segment in segments)
+        )
+        if cd.time_window_s == 0:
+            return None
+        cd.time_window_ms = self.uc.s_to_ms(cd.time_window_s)
+        cd.num_values = sum(segment["num_values"] for segment in segments)
+        cd.avg_current_Ah = sum(segment["charge_Ah"] for segment in segments) / (
+            self.uc.s_to_h(cd.time_window_s)
+        )
+        cd.avg_current_mAh = self.uc.A_to_mA(cd.avg_current_Ah)
+        return cd
+
+    def _read_compressed_csv(
+        self,
+        csv_file_path: str,
+        start_timestamp_us: int,
+        end_timestamp_us: int,
+        allow_empty: bool = False,
+    ) -> pd.DataFrame:
+        """Reads only the blocks of a block compressed CSV file that overlap the given timestamps.
+
+        Args:
+            csv_file_path (str): The path of the compressed CSV file.
+            start_timestamp_us (int): The start timestamp in us.
+            end_timestamp_us (int): The end timestamp in us.
+            allow_empty (bool, optional): Return no rows instead of raising if no block was written yet. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The data from the overlapping blocks.
+        """
+        reader = CompressedCsvReader(csv_file_path)
+        if reader.get_number_of_blocks() == 0:
+            if allow_empty:
+                return self._make_empty_capture()
+            raise ValueError(f"The file '{csv_file_path}' contains no data.")
+
+        first_block, last_block = reader.find_blocks(
+            "rx timestamp (us)", start_timestamp_us, end_timestamp_us
+        )
+        return pd.read_csv(
+            io.StringIO(reader.read_blocks(first_block, last_block)), comment="#"
+        )
+
+    def _decode_varint_records(self, data: np.ndarray) -> tuple[np.ndarray, int]:
+        """Decodes the complete records of a binary capture chunk.
+
+        The varints are decoded one byte position at a time (first byte of every varint,
+        then the second byte of the varints which have one, ...), so the temporary arrays
+        are per varint instead of per byte.
+
+        Args:
+            data (np.ndarray): The encoded bytes (uint8), starting at a record boundary.
+
+        Returns:
+            tuple[np.ndarray, int]: The decoded fields with one row per record and the number of bytes consumed.
+        """
+        fields_per_record = BinaryCaptureWriter.FIELDS_PER_RECORD
+
+        # The last byte of every varint has the continuation bit cleared
+        varint_ends = np.flatnonzero(data < 0x80).astype(np.int32)
+        varint_ends = varint_ends[: len(varint_ends) - len(varint_ends) % fields_per_record]
+        if len(varint_ends) == 0:
+            return np.empty((0, fields_per_record), dtype=np.int64), 0
+
+        varint_starts = np.empty_like(varint_ends)
+        varint_starts[0] = 0
+        varint_starts[1:] = varint_ends[:-1] + 1
+        varint_lengths = varint_ends - varint_starts + 1
+
+        max_varint_length = int(varint_lengths.max())
+        if max_varint_length > BinaryCaptureWriter.MAX_VARINT_LENGTH:
+            raise ValueError(f"Corrupted binary capture, varint of {max_varint_length} bytes.")
+
+        values = (data[varint_starts] & 0x7F).astype(np.uint64)
+        for byte_position in range(1, max_varint_length):
+            longer = np.flatnonzero(varint_lengths > byte_position)
+            values[longer] |= (
+                data[varint_starts[longer] + byte_position] & 0x7F
+            ).astype(np.uint64) << np.uint64(7 * byte_position)
+
+        return (
+            values.view(np.int64).reshape(-1, fields_per_record),
+            int(varint_ends[-1]) + 1,
+        )
+
+    def _read_binary_capture(
+        self, capture_file_path: str, allow_empty: bool = False
+    ) -> pd.DataFrame:
+        """Decodes a delta/varint encoded binary capture written by BinaryCaptureWriter.
+
+        The file is decoded in chunks of DECODE_CHUNK_SIZE bytes, cut at record
+        boundaries, to bound the memory used by the temporary arrays.
+
+        Args:
+            capture_file_path (str): The path of the binary capture file.
+            allow_empty (bool, optional): Return no rows instead of raising if no record was written yet. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The decoded data with the same columns as the CSV file.
+        """
+
+        def unzigzag(column: np.ndarray) -> np.ndarray:
+            return (column >> 1) ^ -(column & 1)
+
+        rx_timestamp_chunks = []
+        board_timestamp_chunks = []
+        current_chunks = []
+        last_rx_timestamp_us = 0
+        last_board_timestamp_ms = 0
+
+        with open(capture_file_path, "rb") as file:
+            header = file.read(BinaryCaptureWriter.HEADER.size)
+            if len(header) < BinaryCaptureWriter.HEADER.size:
+                if allow_empty:
+                    return self._make_empty_capture()
+                raise ValueError(f"The file '{capture_file_path}' contains no data.")
+
+            magic, version = BinaryCaptureWriter.HEADER.unpack(header)
+            if magic != BinaryCaptureWriter.MAGIC or version != BinaryCaptureWriter.VERSION:
+                raise ValueError(
+                    f"The file '{capture_file_path}' is not a version {BinaryCaptureWriter.VERSION} binary capture."
+                )
+
+            leftover = b""
+            while True:
+                raw = file.read(self.DECODE_CHUNK_SIZE)
+                if not raw:
+                    # Anything left is an incomplete record (e.g. an interrupted write)
+                    break
+
+                chunk = leftover + raw
+                records, consumed = self._decode_varint_records(
+                    np.frombuffer(chunk, dtype=np.uint8)
+                )
+                leftover = chunk[consumed:]
+                if len(records) == 0:
+                    continue
+
+                rx_timestamp_us = np.cumsum(unzigzag(records[:, 0])) + last_rx_timestamp_us
+                board_timestamp_ms = (
+                    np.cumsum(unzigzag(records[:, 1])) + last_board_timestamp_ms
+                )
+                last_rx_timestamp_us = int(rx_timestamp_us[-1])
+                last_board_timestamp_ms = int(board_timestamp_ms[-1])
+
+                exponent = unzigzag(records[:, 3])
+                current_uA = self.uc.A_to_uA(
+                    records[:, 2] * np.power(10.0, exponent)
+                ).round(4)
+                current_uA[exponent == BinaryCaptureWriter.GAP_EXPONENT] = np.nan
+
+                rx_timestamp_chunks.append(rx_timestamp_us)
+                board_timestamp_chunks.append(board_timestamp_ms)
+                current_chunks.append(current_uA)
+
+        if not current_chunks:
+            if allow_empty:
+                return self._make_empty_capture()
+            raise ValueError(f"The file '{capture_file_path}' contains no data.")
+
+        # Join one column at a time and release its chunks before the next one
+        columns = {}
+        for column, chunks in (
+            ("Current (uA)", current_chunks),
+            ("rx timestamp (us)", rx_timestamp_chunks),
+            ("board timestamps (ms)", board_timestamp_chunks),
+        ):
+            columns[column] = np.concatenate(chunks)
+            chunks.clear()
+
+        return pd.DataFrame(columns, copy=False)
+
     def _load_csv_cache(self, csv_file_path) -> CacheData:
         cd = CacheData()
         cached_data_str = ""
@@ -114,6 +438,10 @@ class DataAnalysis:
         return self.cached_data
 
     def write_csv_cache_data(self, cached_data: CacheData) -> None:
+        if not self._is_plain_csv():
+            print("Cache data can only be written to uncompressed CSV files, skipping")
+            return
+
         cache_data_str = (
             f"##########################################################################################################\n"
             f"# This comment is auto generated by data_analysis.py script from https://github.com/lazicdanilo/LPM01A-lib\n"
@@ -174,7 +502,9 @@ class DataAnalysis:
 
             window_size_h = self.uc.us_to_h(window_size_us)
 
-            sum_value_Ah += mean_value_in_window_A * window_size_h
+            # Windows next to a gap marker have no current and are not integrated
+            if not pd.isna(mean_value_in_window_A):
+                sum_value_Ah += mean_value_in_window_A * window_size_h
 
             # Print percentage every 0.5 percent
             if (
@@ -198,19 +528,35 @@ class DataAnalysis:
         """Returns the number of values within the given timestamps.
 
         Returns:
-            int: The number of values within the given timestamps.
+            int: The number of values within the given timestamps (gap markers are not counted).
         """
-        return len(self.filtered_df)
+        return int(self.filtered_df["Current (uA)"].count())
+
+    def get_gap_time(self) -> float:
+        """Returns the time in seconds lost in gaps (e.g. serial reconnects) within the given timestamps.
+
+        A gap marker is a line without current, the windows before and after it hold no valid data.
+
+        Returns:
+            float: The gap time in seconds.
+        """
+        current = self.filtered_df["Current (uA)"]
+        window_size_us = self.filtered_df["rx timestamp (us)"].diff()
+        gap_windows = current.isna() | current.shift().isna()
+        return self.uc.us_to_s(float(window_size_us[gap_windows].sum()))
 
     def get_time_slice(self) -> float:
-        """Returns the time slice in seconds.
+        """Returns the time slice in seconds, excluding the time lost in gaps.
 
         Returns:
             float: The time slice in seconds.
         """
-        return self.uc.us_to_s(
-            self.filtered_df["rx timestamp (us)"].iloc[-1]
-            - self.filtered_df["rx timestamp (us)"].iloc[0]
+        return (
+            self.uc.us_to_s(
+                self.filtered_df["rx timestamp (us)"].iloc[-1]
+                - self.filtered_df["rx timestamp (us)"].iloc[0]
+            )
+            - self.get_gap_time()
         )
 
     def plot_current_vs_timestamp(
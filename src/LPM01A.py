@@ -4,12 +4,36 @@ from enum import Enum
 import re
 from src.SerialCommunication import SerialCommunication
 from src.CsvWriter import CsvWriter
+from src.CompressedCsvWriter import CompressedCsvWriter
+from src.BinaryCaptureWriter import BinaryCaptureWriter
+from src.SegmentedCaptureWriter import SegmentedCaptureWriter
+from src.StreamServer import StreamServer
 from src.UnitConversions import UnitConversions
 
 
 class LPM01A:
+    TIMESTAMP_PATTERN = re.compile(r"TimeStamp: (\d+)s (\d+)ms, buff (\d+)%")
+
+    # An endless capture without any data for this long is treated as a lost connection
+    NO_DATA_TIMEOUT_S = 5
+    # The time to wait for a running acquisition to stop before re-initializing the device
+    STOP_TIMEOUT_S = 5
+
+    CAPTURE_WRITERS = {
+        "csv": CsvWriter,
+        "csv.gz": CompressedCsvWriter,
+        "lpmc": BinaryCaptureWriter,
+    }
+
     def __init__(
-        self, port: str, baud_rate: int, print_info_every_ms: int = 10_000
+        self,
+        port: str,
+        baud_rate: int,
+        print_info_every_ms: int = 10_000,
+        capture_format: str = "csv",
+        max_segment_bytes: int = None,
+        max_segment_s: float = None,
+        stream_server: StreamServer = None,
     ) -> None:
         """
         Initializes the LPM01A device with the given port and baud rate.
@@ -18,105 +42,248 @@ class LPM01A:
             port (str): The port where the LPM01A device is connected.
             baud_rate (int): The baud rate for the serial communication.
             print_info_every_ms (int): The interval in ms to print the info.
+            capture_format (str): The format of the capture file, "csv", "csv.gz" (block compressed CSV)
+                or "lpmc" (delta/varint encoded binary capture).
+            max_segment_bytes (int): If set, the capture is split into segments of this size in bytes, described by a manifest file.
+            max_segment_s (float): If set, the capture is split into segments of this duration in s, described by a manifest file.
+            stream_server (StreamServer): If set, the server is started and the decoded samples and stats are published to it.
+                It is stopped by deinit_capture.
         """
+        if capture_format not in self.CAPTURE_WRITERS:
+            raise ValueError(
+                f"Unsupported capture format: {capture_format}, "
+                f"supported formats: {', '.join(self.CAPTURE_WRITERS)}"
+            )
+
         self.serial_comm = SerialCommunication(port, baud_rate)
         self.serial_comm.open_serial()
-        self.csv_writer = CsvWriter()
-        self.csv_writer.write("Current (uA),rx timestamp (us),board timestamps (ms)\n")
+        if max_segment_bytes is None and max_segment_s is None:
+            self.writer = self.CAPTURE_WRITERS[capture_format]()
+        else:
+            self.writer = SegmentedCaptureWriter(
+                self.CAPTURE_WRITERS[capture_format], max_segment_bytes, max_segment_s
+            )
+        self.writer.write_header()
+
+        self.stream_server = stream_server
+        if self.stream_server:
+            self.stream_server.start()
 
         self.uc = UnitConversions()
 
         self.print_info_every_ms = print_info_every_ms
 
         self.mode = None
+        self.device_config = None
 
         self.board_timestamp_ms = 0
         self.capture_start_us = 0
         self.num_of_captured_values = 0
         self.last_print_timestamp_ms = 0
         self.board_buffer_usage_percentage = 0
+        self.num_of_parse_errors = 0
+        self.num_of_gaps = 0
 
         self.sum_current_values_ua = 0
         self.number_of_current_values = 0
 
+        self.last_stats_timestamp_ms = 0
+        self.stats_sum_current_values_ua = 0
+        self.stats_number_of_current_values = 0
+
     def _read_and_parse_ascii(self) -> None:
         """
         Reads and parses the data from the LPM01A device in ASCII mode.
+
+        If the serial connection is lost, it is re-established, the device is
+        re-initialized and the gap is recorded in the capture file. During an endless
+        capture (duration 0) receiving no data for NO_DATA_TIMEOUT_S is handled the same way.
         """
+        last_data_time_s = time()
         while True:
-            response = self.serial_comm.receive_data()
-            if not response:
+            try:
+                responses = self.serial_comm.read_lines()
+            except OSError as e:
+                self._reconnect(e)
+                last_data_time_s = time()
                 continue
 
-            if "TimeStamp:" in response:
-                try:
-                    match = re.search(
-                        "TimeStamp: (\d+)s (\d+)ms, buff (\d+)%", response
+            if not responses:
+                if (
+                    self.device_config["duration"] == 0
+                    and time() - last_data_time_s > self.NO_DATA_TIMEOUT_S
+                ):
+                    self._reconnect(
+                        OSError(f"no data received for {self.NO_DATA_TIMEOUT_S} s")
                     )
-                    if match:
-                        self.board_timestamp_ms = (
-                            int(match.group(2)) + int(match.group(1)) * 1000
-                        )
-                        self.board_buffer_usage_percentage = int(match.group(3))
-
-                except:
-                    print(f"Error parsing timestamp: {response}")
+                    last_data_time_s = time()
                 continue
+            last_data_time_s = time()
+
+            for response in responses:
+                if response:
+                    self._parse_ascii_line(response)
 
-            if "-" in response:
-                exponent_sign = "-"
-            elif "+" in response:
-                exponent_sign = "+"
+    def _parse_ascii_line(self, response: str) -> None:
+        """
+        Parses a single line received from the LPM01A device in ASCII mode.
 
+        Args:
+            response (str): The received line.
+        """
+        if "TimeStamp:" in response:
+            match = self.TIMESTAMP_PATTERN.search(response)
+            if match:
+                self.board_timestamp_ms = (
+                    int(match.group(2)) + int(match.group(1)) * 1000
+                )
+                self.board_buffer_usage_percentage = int(match.group(3))
+            else:
+                self.num_of_parse_errors += 1
+            return
+
+        if "-" in response:
+            exponent_sign = "-"
+        elif "+" in response:
+            exponent_sign = "+"
+        else:
+            self.num_of_parse_errors += 1
+            return
+
+        try:
+            split_response = response.split(exponent_sign)
             try:
-                split_response = response.split("-")
-                try:
-                    current = int(split_response[0])  # Extract the raw current value
-                except ValueError:
-                    # When the TimeStamp is received,
-                    # the next current values has \x00 in the beginning so I need to strip it
-                    current = int(split_response[0][1:])
-
-                exponent = int(split_response[1])  # Extract the exponent value
-
-                # Apply the exponent with the correct sign
-                if exponent_sign == "+":
-                    current = current * pow(10, exponent)
-                else:
-                    current = current * pow(10, ((-1) * exponent))
+                mantissa = int(split_response[0])  # Extract the raw current value
+            except ValueError:
+                # When the TimeStamp is received,
+                # the next current values has \x00 in the beginning so I need to strip it
+                mantissa = int(split_response[0][1:])
+
+            exponent = int(split_response[1])  # Extract the exponent value
+        except (ValueError, IndexError):
+            self.num_of_parse_errors += 1
+            return
+
+        # Apply the correct sign to the exponent
+        if exponent_sign == "-":
+            exponent = -exponent
+
+        current = self.uc.mantissa_exponent_to_uA(mantissa, exponent)
+
+        local_timestamp_us = int(self.uc.s_to_us(time())) - self.capture_start_us
+        self.writer.write_sample(
+            mantissa, exponent, local_timestamp_us, self.board_timestamp_ms
+        )
+        self.num_of_captured_values += 1
+
+        if self.stream_server:
+            self.stream_server.publish_sample(
+                local_timestamp_us, self.board_timestamp_ms, current
+            )
+            self._publish_stats(local_timestamp_us, current)
+
+        self.sum_current_values_ua += current
+        self.number_of_current_values += 1
+
+        if (
+            self.uc.us_to_ms(local_timestamp_us) - self.last_print_timestamp_ms
+            > self.print_info_every_ms
+        ):
+            average_current = self.sum_current_values_ua / self.number_of_current_values
+            average_current = round(average_current, 4)
+            self.sum_current_values_ua = 0
+            self.number_of_current_values = 0
+            print(
+                f"Average current for previous {self.print_info_every_ms} ms: {average_current} uA\n"
+                f"Local timestamp: {self.uc.us_to_ms(local_timestamp_us)} ms\n"
+                f"Num of received values: {self.num_of_captured_values}\n"
+                f"LPM01A buffer usage: {self.board_buffer_usage_percentage}%\n"
+                f"Parse errors: {self.num_of_parse_errors}, "
+                f"corrupted lines: {self.serial_comm.num_of_corrupted_lines}, "
+                f"gaps: {self.num_of_gaps}\n"
+            )
+            self.last_print_timestamp_ms = self.uc.us_to_ms(local_timestamp_us)
+
+    def _publish_stats(self, local_timestamp_us: int, current: float) -> None:
+        """
+        Accumulates the current and publishes the stats to the stream server
+        every stats_interval_ms of the stream server.
 
-                current = round(self.uc.A_to_uA(current), 4)
+        Args:
+            local_timestamp_us (int): The local receive timestamp in us of the current value.
+            current (float): The current in uA.
+        """
+        self.stats_sum_current_values_ua += current
+        self.stats_number_of_current_values += 1
+
+        if (
+            self.uc.us_to_ms(local_timestamp_us) - self.last_stats_timestamp_ms
+            > self.stream_server.stats_interval_ms
+        ):
+            average_current = round(
+                self.stats_sum_current_values_ua / self.stats_number_of_current_values,
+                4,
+            )
+            self.stats_sum_current_values_ua = 0
+            self.stats_number_of_current_values = 0
+            self.last_stats_timestamp_ms = self.uc.us_to_ms(local_timestamp_us)
+
+            self.stream_server.publish_stats(
+                local_timestamp_us,
+                self.num_of_captured_values,
+                average_current,
+                self.board_buffer_usage_percentage,
+            )
+
+    def _reconnect(self, error: OSError) -> None:
+        """
+        Re-establishes the serial connection, restarts the capture with the last
+        init_device parameters and records the gap in the capture file.
 
-                local_timestamp_us = (
-                    int(self.uc.s_to_us(time())) - self.capture_start_us
-                )
-                self.csv_writer.write(
-                    f"{current},{local_timestamp_us},{self.board_timestamp_ms}\n"
-                )
-                self.num_of_captured_values += 1
+        Args:
+            error (OSError): The error which caused the connection loss.
+        """
+        print(f"Serial connection lost: {error}, reconnecting...")
+        gap_start_us = int(self.uc.s_to_us(time())) - self.capture_start_us
 
-                self.sum_current_values_ua += current
-                self.number_of_current_values += 1
+        while True:
+            try:
+                self.serial_comm.reconnect()
+                self._stop_running_acquisition()
+                self.init_device(**self.device_config)
+                if self.start_capture():
+                    break
+                print("The LPM01A didn't acknowledge the start command, reconnecting...")
+            except OSError as e:
+                print(f"Restarting the capture failed: {e}, reconnecting...")
+
+        # The LPM01A restarts its timestamps with the new acquisition
+        self.board_timestamp_ms = 0
 
-                if (
-                    self.uc.us_to_ms(local_timestamp_us) - self.last_print_timestamp_ms
-                    > self.print_info_every_ms
-                ):
-                    average_current = (
-                        self.sum_current_values_ua / self.number_of_current_values
-                    )
-                    average_current = round(average_current, 4)
-                    self.sum_current_values_ua = 0
-                    self.number_of_current_values = 0
-                    print(
-                        f"Average current for previous {self.print_info_every_ms} ms: {average_current} uA\n"
-                        f"Local timestamp: {self.uc.us_to_ms(local_timestamp_us)} ms\n"
-                        f"Num of received values: {self.num_of_captured_values}\n"
-                        f"LPM01A buffer usage: {self.board_buffer_usage_percentage}%\n"
-                    )
-                    self.last_print_timestamp_ms = self.uc.us_to_ms(local_timestamp_us)
-            except:
-                print(f"Error parsing data: {response}")
+        gap_end_us = int(self.uc.s_to_us(time())) - self.capture_start_us
+        self.writer.write_gap(gap_end_us, self.board_timestamp_ms)
+        if self.stream_server:
+            self.stream_server.publish_gap(gap_start_us, gap_end_us)
+        self.num_of_gaps += 1
+        print(
+            f"Capture restarted, recorded a gap of {self.uc.us_to_ms(gap_end_us - gap_start_us)} ms"
+        )
+
+    def _stop_running_acquisition(self) -> None:
+        """
+        Stops the acquisition if the LPM01A kept acquiring while the connection was lost,
+        as it ignores the other commands during an acquisition.
+
+        Waits until the acquisition is completed, no more data is received or
+        STOP_TIMEOUT_S expires, then discards the received data.
+        """
+        self.serial_comm.send_data("stop")
+        tick_start = time()
+        while time() - tick_start < self.STOP_TIMEOUT_S:
+            response = self.serial_comm.receive_data()
+            if response == "" or "Acquisition completed" in response:
+                break
+        self.serial_comm.flush_input()
 
     def send_command_wait_for_response(
         self, command: str, expected_response: str = None, timeout_s: int = 5
@@ -172,6 +339,12 @@ class LPM01A:
         """
 
         self.mode = mode
+        self.device_config = {
+            "mode": mode,
+            "voltage": voltage,
+            "freq": freq,
+            "duration": duration,
+        }
         self.send_command_wait_for_response("htc")
 
         if self.mode == "ascii":
@@ -184,12 +357,15 @@ class LPM01A:
         self.send_command_wait_for_response(f"freq {freq}")
         self.send_command_wait_for_response(f"acqtime {duration}")
 
-    def start_capture(self) -> None:
+    def start_capture(self) -> bool:
         """
         Starts the capture of the LPM01A device.
+
+        Returns:
+            bool: True if the LPM01A acknowledged the start command, False otherwise.
         """
         print(f"Starting capture, printing info every {self.print_info_every_ms} ms")
-        self.send_command_wait_for_response("start")
+        return self.send_command_wait_for_response("start")
 
     def stop_capture(self) -> None:
         """
@@ -204,8 +380,10 @@ class LPM01A:
         """
         Deinitializes the capture of the LPM01A device.
         """
-        self.csv_writer.close()
+        self.writer.close()
         self.serial_comm.close_serial()
+        if self.stream_server:
+            self.stream_server.stop()
 
     def read_and_parse_data(self) -> None:
         """
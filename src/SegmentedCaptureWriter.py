@@ -0,0 +1,195 @@
+import datetime
+import json
+import os
+from src.CsvWriter import CsvWriter
+from src.UnitConversions import UnitConversions
+
+
+class SegmentedCaptureWriter:
+    """Splits an endless capture into segment files and keeps a manifest describing them.
+
+    A new segment is started when the current one reaches max_segment_bytes or spans
+    max_segment_s. The manifest (<base name>.manifest.json) lists every segment with its
+    time range, number of values, charge and time lost in gaps, so DataAnalysis can open
+    the manifest as one capture and read only the segments overlapping the requested
+    time window.
+
+    The manifest is rewritten on every rotation and on close. The segment that is still
+    being written is listed with "complete": false.
+    """
+
+    MANIFEST_EXTENSION = ".manifest.json"
+    MANIFEST_VERSION = 1
+
+    # The segment size is only checked every SIZE_CHECK_INTERVAL samples
+    SIZE_CHECK_INTERVAL = 1000
+
+    def __init__(
+        self,
+        writer_class: type = CsvWriter,
+        max_segment_bytes: int = None,
+        max_segment_s: float = None,
+        base_filename: str = None,
+    ) -> None:
+        """Initializes the SegmentedCaptureWriter and opens the first segment.
+
+        Args:
+            writer_class (type): The writer used for the segments (CsvWriter, CompressedCsvWriter or BinaryCaptureWriter).
+            max_segment_bytes (int, optional): The size in bytes after which a new segment is started. Defaults to None (no limit).
+            max_segment_s (float, optional): The duration in s after which a new segment is started. Defaults to None (no limit).
+            base_filename (str, optional): The base name for the segments and the manifest. If None, a name will be generated based on the current date and time.
+        """
+        self.uc = UnitConversions()
+
+        self.writer_class = writer_class
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_us = (
+            None if max_segment_s is None else self.uc.s_to_us(max_segment_s)
+        )
+
+        if base_filename is None:
+            now = datetime.datetime.now()
+            base_filename = f"lpm01a_{now.strftime('%H%M%S_%d%m%Y')}"
+
+        self.filename = f"{base_filename}{self.MANIFEST_EXTENSION}"
+        self.base_filename = base_filename
+        self.manifest_path = f"{CsvWriter.CSV_LOGS_FOLDER}/{self.filename}"
+        self.created = datetime.datetime.now().strftime("%d-%m-%Y_%H:%M:%S")
+
+        self.segments = []
+        self.writer = None
+
+        self._last_current_ua = None
+        self._last_rx_timestamp_us = None
+
+        self._open_segment()
+
+    def _open_segment(self) -> None:
+        """Closes the current segment (if any) and starts a new one."""
+        if self.writer is not None:
+            self.writer.close()
+            self.segments[-1]["complete"] = True
+
+        segment_filename = (
+            f"{self.base_filename}_{len(self.segments):04d}"
+            f"{self.writer_class.FILE_EXTENSION}"
+        )
+        self.writer = self.writer_class(segment_filename)
+        self.writer.write_header()
+
+        self.segments.append(
+            {
+                "file": segment_filename,
+                "complete": False,
+                "start_us": None,
+                "end_us": None,
+                "num_values": 0,
+                "charge_Ah": 0.0,
+                "gap_us": 0,
+            }
+        )
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        """Atomically rewrites the manifest file."""
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "created": self.created,
+            "segments": self.segments,
+        }
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _should_rotate(self, segment: dict, rx_timestamp_us: int) -> bool:
+        """Returns True if the current segment reached the size or duration limit."""
+        if segment["num_values"] == 0:
+            return False
+
+        if (
+            self.max_segment_us is not None
+            and rx_timestamp_us - segment["start_us"] >= self.max_segment_us
+        ):
+            return True
+
+        return (
+            self.max_segment_bytes is not None
+            and segment["num_values"] % self.SIZE_CHECK_INTERVAL == 0
+            and self.writer.get_size() >= self.max_segment_bytes
+        )
+
+    def write_header(self) -> None:
+        """Does nothing, every segment gets its header when it is opened."""
+
+    def write_sample(
+        self,
+        mantissa: int,
+        exponent: int,
+        rx_timestamp_us: int,
+        board_timestamp_ms: int,
+    ) -> None:
+        """Writes a single sample to the current segment and updates its summary.
+
+        Args:
+            mantissa (int): The mantissa of the current in A as sent by the LPM01A.
+            exponent (int): The base 10 exponent of the current in A.
+            rx_timestamp_us (int): The local receive timestamp in us.
+            board_timestamp_ms (int): The last timestamp reported by the LPM01A in ms.
+        """
+        if self._should_rotate(self.segments[-1], rx_timestamp_us):
+            self._open_segment()
+
+        segment = self.segments[-1]
+        self.writer.write_sample(mantissa, exponent, rx_timestamp_us, board_timestamp_ms)
+
+        current_ua = self.uc.mantissa_exponent_to_uA(mantissa, exponent)
+
+        # The window between two samples belongs to the segment holding the later one,
+        # so the sum of all segment charges equals the charge of the whole capture
+        if self._last_rx_timestamp_us is not None:
+            window_us = rx_timestamp_us - self._last_rx_timestamp_us
+            if self._last_current_ua is None:
+                # The window after a gap marker
+                segment["gap_us"] += window_us
+            else:
+                segment["charge_Ah"] += self.uc.uA_to_A(
+                    (self._last_current_ua + current_ua) / 2
+                ) * self.uc.us_to_h(window_us)
+
+        if segment["start_us"] is None:
+            segment["start_us"] = rx_timestamp_us
+        segment["end_us"] = rx_timestamp_us
+        segment["num_values"] += 1
+
+        self._last_current_ua = current_ua
+        self._last_rx_timestamp_us = rx_timestamp_us
+
+    def write_gap(self, rx_timestamp_us: int, board_timestamp_ms: int) -> None:
+        """Writes a gap marker to the current segment.
+
+        The windows before and after the marker are counted as gap time instead of charge.
+
+        Args:
+            rx_timestamp_us (int): The local receive timestamp in us when the capture resumed.
+            board_timestamp_ms (int): The board timestamp in ms when the capture resumed.
+        """
+        self.writer.write_gap(rx_timestamp_us, board_timestamp_ms)
+
+        segment = self.segments[-1]
+        if self._last_rx_timestamp_us is not None:
+            segment["gap_us"] += rx_timestamp_us - self._last_rx_timestamp_us
+
+        if segment["start_us"] is None:
+            segment["start_us"] = rx_timestamp_us
+        segment["end_us"] = rx_timestamp_us
+
+        self._last_current_ua = None
+        self._last_rx_timestamp_us = rx_timestamp_us
+
+    def close(self) -> None:
+        """Closes the current segment and writes the final manifest."""
+        self.writer.close()
+        self.segments[-1]["complete"] = True
+        self._write_manifest()
+        print("Closing manifest: ", self.filename)
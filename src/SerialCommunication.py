@@ -1,7 +1,12 @@
 import serial
+from time import sleep
+from time import time
 
 
 class SerialCommunication:
+    # Lines longer than this can't be valid frames, the data is dropped until the next line break
+    MAX_LINE_LENGTH = 1024
+
     def __init__(self, port: str, baud_rate: int) -> None:
         """Initializes the SerialCommunication with the given port and baud rate.
 
@@ -14,8 +19,17 @@ class SerialCommunication:
         self.baud_rate = baud_rate
         self.ser = None
 
+        self.num_of_corrupted_lines = 0
+
+        self._rx_buffer = b""
+        self._resync = False
+
     def open_serial(self) -> None:
-        """Opens the serial communication."""
+        """Opens the serial communication.
+
+        Raises:
+            serial.SerialException: If the serial port can't be opened.
+        """
         try:
             self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=1)
             print(
@@ -23,7 +37,7 @@ class SerialCommunication:
             )
         except serial.SerialException as e:
             print(f"Error: {e}")
-            exit(1)
+            raise
 
     def close_serial(self) -> None:
         """Closes the serial communication."""
@@ -31,6 +45,40 @@ class SerialCommunication:
             self.ser.close()
             print("Serial connection closed.")
 
+    def reconnect(self, retry_interval_s: float = 1) -> None:
+        """Closes the serial communication and reopens it, retrying until it succeeds.
+
+        Any partially received line is dropped. The commands sent after reconnecting
+        read whole lines, so read_lines() resumes on a frame boundary.
+
+        Args:
+            retry_interval_s (float): The time in s to wait between the attempts.
+        """
+        tick_start = time()
+        try:
+            self.close_serial()
+        except OSError:
+            pass
+
+        while True:
+            try:
+                self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=1)
+                break
+            except serial.SerialException:
+                sleep(retry_interval_s)
+
+        self._rx_buffer = b""
+        self._resync = False
+        print(
+            f"Serial communication re-established on {self.serial_port} after {time() - tick_start:.2f} s"
+        )
+
+    def flush_input(self) -> None:
+        """Discards the received data which wasn't read yet, including a partially received line."""
+        self.ser.reset_input_buffer()
+        self._rx_buffer = b""
+        self._resync = False
+
     def send_data(self, data: str) -> None:
         """Sends the given data to the device."""
         self.ser.write((data + "\n").encode())
@@ -41,9 +89,47 @@ class SerialCommunication:
         Returns:
             str: The received data from the device.
         """
-        response = self.ser.readline().decode().strip()
+        response = self.ser.readline().decode(errors="replace").strip()
         return response
 
+    def read_lines(self) -> list[str]:
+        """Reads all the available data from the device and splits it into lines.
+
+        Waits for up to the serial timeout if no data is available. Incomplete lines are
+        kept until the rest is received, lines which can't be decoded are dropped and
+        counted in num_of_corrupted_lines.
+
+        Returns:
+            list[str]: The complete lines received so far.
+
+        Raises:
+            serial.SerialException: If the serial connection is lost.
+        """
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if not data:
+            return []
+
+        raw_lines = (self._rx_buffer + data).split(b"\n")
+        self._rx_buffer = raw_lines.pop()
+
+        if self._resync and raw_lines:
+            # The first line may have been cut, resume on the next line break
+            raw_lines.pop(0)
+            self._resync = False
+
+        if len(self._rx_buffer) > self.MAX_LINE_LENGTH:
+            self._rx_buffer = b""
+            self._resync = True
+            self.num_of_corrupted_lines += 1
+
+        lines = []
+        for raw_line in raw_lines:
+            try:
+                lines.append(raw_line.decode().strip())
+            except UnicodeDecodeError:
+                self.num_of_corrupted_lines += 1
+        return lines
+
     def receive_data_raw(self, num_bytes: int) -> bytes:
         """Receives raw data from the device.
 
@@ -0,0 +1,357 @@
+import os
+import socket
+import struct
+import threading
+from collections import deque
+from time import sleep
+
+
+class _Subscriber:
+    """A connected client with its own frame queue and sender thread."""
+
+    def __init__(self, connection: socket.socket, max_queued_frames: int) -> None:
+        self.connection = connection
+        self.frames = deque(maxlen=max_queued_frames)
+        self.frame_available = threading.Event()
+        self.dropped_frames = 0
+        self.connected = True
+        self.thread = None
+
+    def enqueue(self, frame: bytes) -> None:
+        """Queues a frame, dropping the oldest one if the subscriber is falling behind."""
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped_frames += 1
+        self.frames.append(frame)
+        self.frame_available.set()
+
+    def finish(self) -> None:
+        """Lets the sender thread send the queued frames and stop."""
+        self.connected = False
+        self.frame_available.set()
+
+    def disconnect(self) -> None:
+        """Stops the sender thread and closes the connection."""
+        self.connected = False
+        self.frame_available.set()
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+
+class StreamServer:
+    """Publishes live capture data to any number of local subscribers over TCP or a Unix socket.
+
+    Every frame starts with FRAME_HEADER (magic b"LP", frame type, sequence number,
+    number of entries) followed by the entries:
+        - FRAME_TYPE_SAMPLES: SAMPLE entries (rx timestamp in us, board timestamp in ms, current in uA)
+        - FRAME_TYPE_STATS: one STATS entry (rx timestamp in us, number of captured values,
+          average current in uA since the previous stats frame, LPM01A buffer usage in %)
+        - FRAME_TYPE_GAP: one GAP entry (rx timestamp in us when the connection to the
+          LPM01A was lost, rx timestamp in us when the capture resumed)
+
+    Samples are batched into frames on the acquisition thread. A frame is sent when it
+    is full or its first sample is older than max_frame_latency_ms; a timer thread also
+    flushes the pending samples when no new sample arrives (e.g. during a reconnect).
+    The sending is done by a thread per subscriber. Each subscriber has a bounded queue;
+    when a subscriber can't keep up the oldest frames are dropped (visible as a jump in
+    the sequence number) and a subscriber that blocks for longer than send_timeout_s is
+    disconnected, so a slow client never stalls the serial reader.
+    """
+
+    FRAME_HEADER = struct.Struct("<2sBIH")
+    SAMPLE = struct.Struct("<qIf")
+    STATS = struct.Struct("<qQdB")
+    GAP = struct.Struct("<qq")
+
+    MAGIC = b"LP"
+    FRAME_TYPE_SAMPLES = 1
+    FRAME_TYPE_STATS = 2
+    FRAME_TYPE_GAP = 3
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 5025,
+        unix_socket_path: str = None,
+        samples_per_frame: int = 100,
+        max_frame_latency_ms: int = 50,
+        stats_interval_ms: int = 1000,
+        max_queued_frames: int = 256,
+        send_timeout_s: float = 5,
+    ) -> None:
+        """Initializes the StreamServer.
+
+        Args:
+            host (str): The host to listen on for TCP connections.
+            port (int): The TCP port to listen on.
+            unix_socket_path (str, optional): If set, a Unix socket is created at this path instead of a TCP socket.
+            samples_per_frame (int): The maximum number of samples in a frame.
+            max_frame_latency_ms (int): Pending samples are sent after at most about this long, even if the frame isn't full.
+            stats_interval_ms (int): The interval in ms at which the stats frames are published,
+                independent of the interval the info is printed at.
+            max_queued_frames (int): The number of frames queued per subscriber before the oldest ones are dropped.
+            send_timeout_s (float): Subscribers blocking a send for longer than this are disconnected.
+        """
+        self.host = host
+        self.port = port
+        self.unix_socket_path = unix_socket_path
+        self.samples_per_frame = samples_per_frame
+        self.max_frame_latency_us = max_frame_latency_ms * 1000
+        self.stats_interval_ms = stats_interval_ms
+        self.max_queued_frames = max_queued_frames
+        self.send_timeout_s = send_timeout_s
+
+        self.server_socket = None
+        self.running = False
+
+        self._samples = []
+        self._sequence = 0
+        # Guards the pending samples and the sequence number, which are also used by the flush thread
+        self._frame_lock = threading.Lock()
+        self._subscribers = ()
+        self._subscribers_lock = threading.Lock()
+        self._accept_thread = None
+        self._flush_thread = None
+
+    def start(self) -> None:
+        """Starts listening for subscribers."""
+        if self.unix_socket_path:
+            if os.path.exists(self.unix_socket_path):
+                os.remove(self.unix_socket_path)
+            self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server_socket.bind(self.unix_socket_path)
+            address = self.unix_socket_path
+        else:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+            address = f"{self.host}:{self.port}"
+
+        self.server_socket.listen()
+        self.server_socket.settimeout(0.5)
+        self.running = True
+
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+        print(f"Streaming capture data on {address}")
+
+    def stop(self) -> None:
+        """Sends the pending samples, disconnects all subscribers and closes the server socket.
+
+        Subscribers get up to send_timeout_s to receive the frames queued for them.
+        """
+        self.running = False
+        if self._accept_thread:
+            self._accept_thread.join()
+        if self._flush_thread:
+            self._flush_thread.join()
+
+        with self._frame_lock:
+            if self._samples and self._subscribers:
+                self._flush_samples()
+
+        subscribers = self._subscribers
+        for subscriber in subscribers:
+            subscriber.finish()
+        for subscriber in subscribers:
+            subscriber.thread.join(self.send_timeout_s)
+            subscriber.disconnect()
+        self._subscribers = ()
+        if self.server_socket:
+            self.server_socket.close()
+        if self.unix_socket_path and os.path.exists(self.unix_socket_path):
+            os.remove(self.unix_socket_path)
+
+    def _accept_loop(self) -> None:
+        """Accepts new subscribers until the server is stopped."""
+        while self.running:
+            try:
+                connection, _ = self.server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+
+            connection.settimeout(self.send_timeout_s)
+            subscriber = _Subscriber(connection, self.max_queued_frames)
+            subscriber.thread = threading.Thread(
+                target=self._send_loop, args=(subscriber,), daemon=True
+            )
+            with self._subscribers_lock:
+                self._subscribers = self._subscribers + (subscriber,)
+            subscriber.thread.start()
+
+    def _flush_loop(self) -> None:
+        """Sends the pending samples every max_frame_latency_ms, so they aren't held back when no new sample arrives."""
+        while self.running:
+            sleep(self.max_frame_latency_us / 1_000_000)
+            with self._frame_lock:
+                if self._samples and self._subscribers:
+                    self._flush_samples()
+
+    def _send_loop(self, subscriber: _Subscriber) -> None:
+        """Sends the queued frames to a subscriber until it disconnects."""
+        while True:
+            subscriber.frame_available.wait()
+            subscriber.frame_available.clear()
+            try:
+                while subscriber.frames:
+                    subscriber.connection.sendall(subscriber.frames.popleft())
+            except OSError:
+                # Disconnected, or blocked for longer than send_timeout_s
+                break
+            # Checked after sending, so the frames queued before finish() are still sent
+            if not subscriber.connected:
+                break
+
+        subscriber.disconnect()
+        with self._subscribers_lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+
+    def _broadcast(self, frame_type: int, entries: bytes, num_entries: int) -> None:
+        """Queues a frame for every subscriber. Must be called with _frame_lock held."""
+        frame = (
+            self.FRAME_HEADER.pack(self.MAGIC, frame_type, self._sequence, num_entries)
+            + entries
+        )
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        for subscriber in self._subscribers:
+            subscriber.enqueue(frame)
+
+    def _flush_samples(self) -> None:
+        """Packs the batched samples into a frame and queues it for the subscribers. Must be called with _frame_lock held."""
+        entries = b"".join(self.SAMPLE.pack(*sample) for sample in self._samples)
+        self._broadcast(self.FRAME_TYPE_SAMPLES, entries, len(self._samples))
+        self._samples = []
+
+    def get_number_of_subscribers(self) -> int:
+        """Returns the number of connected subscribers.
+
+        Returns:
+            int: The number of connected subscribers.
+        """
+        return len(self._subscribers)
+
+    def publish_sample(
+        self, rx_timestamp_us: int, board_timestamp_ms: int, current_ua: float
+    ) -> None:
+        """Adds a sample to the current frame, the frame is sent when it is full or old enough.
+
+        Args:
+            rx_timestamp_us (int): The local receive timestamp in us.
+            board_timestamp_ms (int): The last timestamp reported by the LPM01A in ms.
+            current_ua (float): The current in uA.
+        """
+        if not self._subscribers:
+            return
+
+        with self._frame_lock:
+            self._samples.append((rx_timestamp_us, board_timestamp_ms, current_ua))
+            if (
+                len(self._samples) >= self.samples_per_frame
+                or rx_timestamp_us - self._samples[0][0] >= self.max_frame_latency_us
+            ):
+                self._flush_samples()
+
+    def publish_stats(
+        self,
+        rx_timestamp_us: int,
+        num_of_captured_values: int,
+        average_current_ua: float,
+        board_buffer_usage_percentage: int,
+    ) -> None:
+        """Sends a stats frame to the subscribers.
+
+        Args:
+            rx_timestamp_us (int): The local receive timestamp in us.
+            num_of_captured_values (int): The number of values captured so far.
+            average_current_ua (float): The average current in uA since the previous stats.
+            board_buffer_usage_percentage (int): The LPM01A buffer usage in %.
+        """
+        if not self._subscribers:
+            return
+
+        with self._frame_lock:
+            self._broadcast(
+                self.FRAME_TYPE_STATS,
+                self.STATS.pack(
+                    rx_timestamp_us,
+                    num_of_captured_values,
+                    average_current_ua,
+                    board_buffer_usage_percentage,
+                ),
+                1,
+            )
+
+    def publish_gap(self, gap_start_us: int, gap_end_us: int) -> None:
+        """Sends the pending samples followed by a gap frame to the subscribers.
+
+        Args:
+            gap_start_us (int): The local timestamp in us when the connection to the LPM01A was lost.
+            gap_end_us (int): The local timestamp in us when the capture resumed.
+        """
+        if not self._subscribers:
+            return
+
+        with self._frame_lock:
+            if self._samples:
+                self._flush_samples()
+            self._broadcast(
+                self.FRAME_TYPE_GAP, self.GAP.pack(gap_start_us, gap_end_us), 1
+            )
+
+
+class StreamClient:
+    """Subscribes to a StreamServer and decodes the received frames."""
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 5025, unix_socket_path: str = None
+    ) -> None:
+        """Connects to the StreamServer.
+
+        Args:
+            host (str): The host of the StreamServer.
+            port (int): The TCP port of the StreamServer.
+            unix_socket_path (str, optional): If set, connects to the Unix socket at this path instead.
+        """
+        if unix_socket_path:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(unix_socket_path)
+        else:
+            self.connection = socket.create_connection((host, port))
+        self.stream = self.connection.makefile("rb")
+
+    def read_frame(self) -> tuple[int, int, list[tuple]]:
+        """Reads the next frame.
+
+        Returns:
+            tuple[int, int, list[tuple]]: The frame type, the sequence number and the decoded entries.
+                Returns (None, None, []) if the server closed the connection.
+        """
+        header = self.stream.read(StreamServer.FRAME_HEADER.size)
+        if len(header) < StreamServer.FRAME_HEADER.size:
+            return None, None, []
+
+        magic, frame_type, sequence, num_entries = StreamServer.FRAME_HEADER.unpack(header)
+        if magic != StreamServer.MAGIC:
+            raise ValueError(f"Invalid frame magic: {magic}")
+
+        if frame_type == StreamServer.FRAME_TYPE_SAMPLES:
+            entry = StreamServer.SAMPLE
+        elif frame_type == StreamServer.FRAME_TYPE_STATS:
+            entry = StreamServer.STATS
+        elif frame_type == StreamServer.FRAME_TYPE_GAP:
+            entry = StreamServer.GAP
+        else:
+            raise ValueError(f"Unknown frame type: {frame_type}")
+
+        payload = self.stream.read(entry.size * num_entries)
+        return frame_type, sequence, list(entry.iter_unpack(payload))
+
+    def close(self) -> None:
+        """Closes the connection."""
+        self.stream.close()
+        self.connection.close()
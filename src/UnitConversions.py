@@ -98,3 +98,15 @@ class UnitConversions:
             float: The time in h.
         """
         return us / 3600_000_000.0
+
+    def mantissa_exponent_to_uA(self, mantissa: int, exponent: int) -> float:
+        """Converts the current given as mantissa and exponent in A (as sent by the LPM01A) to uA.
+
+        Args:
+            mantissa (int): The mantissa of the current in A.
+            exponent (int): The base 10 exponent of the current in A.
+
+        Returns:
+            float: The current in uA rounded to 4 decimals.
+        """
+        return round(self.A_to_uA(mantissa * pow(10, exponent)), 4)